@@ -3,7 +3,7 @@ from common.clients.api_client import ApiClient
 
 class ClientFactory(object):
 
-    def create(self, name, base_url, logger, auth_token=None, extra_headers=None):
+    def create(self, name, base_url, logger, auth_token=None, extra_headers=None, cassette=None):
         while name:
             api_clients = {
                 "ApiClient": lambda: ApiClient(
@@ -11,6 +11,7 @@ class ClientFactory(object):
                     logger,
                     auth_token=auth_token,
                     extra_headers=extra_headers,
+                    cassette=cassette,
                 ),
             }
             try:
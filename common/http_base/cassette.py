@@ -0,0 +1,262 @@
+"""
+Record/replay cassette for HttpClientBase
+
+A cassette is a pair of files on disk:
+    <path>.idx  JSON index of normalized request key -> recorded responses
+    <path>.dat  raw response bodies, appended back to back
+
+In "record" mode requests go to the live service and every request/response
+pair is stored. Both files are written to temporary paths and only swapped in
+on close(), so an aborted or discarded recording leaves the previous cassette
+intact. In "replay" mode no network is used: the body file is memory-mapped and
+responses are served by a dict lookup on the request key, then built by the
+transport adapter exactly like a live response (cookies, encoding, hooks).
+
+Streamed request bodies are buffered in memory before sending, and multipart
+boundaries are ignored when matching, so uploads replay like any other request.
+"""
+import hashlib
+import http.client
+import io
+import json
+import mmap
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from urllib3 import HTTPHeaderDict, HTTPResponse
+
+from common.utils.configs_util import create_directory_if_necessary
+
+RECORD = 'record'
+REPLAY = 'replay'
+CASSETTE_VERSION = 1
+
+_boundary_re = re.compile(rb'\A--([!-~]{1,70})\r\n')
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when a request was never recorded"""
+
+
+class _RecordedHttpResponse(object):
+    """Stand-in for the http.client response requests reads cookies from"""
+
+    def __init__(self, msg):
+        self.msg = msg
+
+
+def buffer_body(req):
+    """Read a streamed or iterable request body into bytes so it can be keyed and resent"""
+    body = req.body
+    if body is None or isinstance(body, (bytes, str)):
+        return
+    if hasattr(body, 'read'):
+        body = body.read()
+    else:
+        body = b''.join(chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in body)
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    req.body = body
+    req.headers.pop('Transfer-Encoding', None)
+    req.headers['Content-Length'] = str(len(body))
+
+
+def request_key(req):
+    """Normalized key for a prepared request: method, canonical url and body digest.
+
+    Headers are left out on purpose so rotating auth tokens do not break replay.
+    """
+    if req.body is not None and not isinstance(req.body, (bytes, str)):
+        raise TypeError(f"Cassette requests need a buffered body, got {type(req.body).__name__}")
+    parts = urlsplit(req.url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    url = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+    body = req.body or b''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    boundary = _boundary_re.match(body)
+    if boundary:
+        # multipart boundaries are random on every send, read from the body as
+        # the client Content-Type header may not carry them
+        body = body.replace(boundary.group(1), b'boundary')
+    return '{} {} {}'.format(req.method.upper(), url, hashlib.sha256(body).hexdigest())
+
+
+class Cassette(object):
+    """
+    Closing any client built with the cassette closes the cassette too, further
+    requests through other clients sharing it raise ValueError. Use it as a
+    context manager to discard a recording when the run raises.
+
+    :param path: cassette path without extension
+    :type path: str
+    :param mode: "record" to hit the live service and store responses, "replay" to serve them
+    :type mode: str
+    :param replay_latency: sleep for the recorded elapsed time before returning a replayed response
+    :type replay_latency: bool
+    """
+
+    def __init__(self, path, mode=REPLAY, replay_latency=False):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Invalid cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.index_path = path + '.idx'
+        self.data_path = path + '.dat'
+        self._index_tmp_path = self.index_path + '.tmp'
+        self._data_tmp_path = self.data_path + '.tmp'
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._cursors = {}
+        self._data_file = None
+        self._data = b''
+        self._offset = 0
+        if mode == RECORD:
+            create_directory_if_necessary(os.path.dirname(os.path.abspath(path)))
+            self._data_file = open(self._data_tmp_path, 'wb')
+        else:
+            self._load()
+
+    def _load(self):
+        with open(self.index_path, 'r', encoding='utf-8') as handle:
+            index = json.load(handle)
+        if index.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version: {index.get('version')}")
+        self._entries = index['entries']
+        self._data_file = open(self.data_path, 'rb')
+        data_size = os.fstat(self._data_file.fileno()).st_size
+        if data_size != index.get('data_size'):
+            self._data_file.close()
+            self._data_file = None
+            raise ValueError(f"Cassette body file {self.data_path} does not match its index")
+        if data_size:
+            self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+    @property
+    def recording(self):
+        return self.mode == RECORD
+
+    @property
+    def closed(self):
+        return self._data_file is None
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError(f"Cassette {self.path} is closed")
+
+    def record(self, req, resp, elapsed):
+        """Append the response body and index the pair under the request key"""
+        body = resp.content or b''
+        with self._lock:
+            self._check_open()
+            self._data_file.write(body)
+            entry = {
+                'status': resp.status_code,
+                'reason': resp.reason,
+                # raw headers keep repeated fields such as Set-Cookie apart
+                'headers': list(resp.raw.headers.iteritems()),
+                'elapsed': elapsed,
+                'offset': self._offset,
+                'length': len(body),
+            }
+            self._offset += len(body)
+            self._entries.setdefault(request_key(req), []).append(entry)
+
+    def play(self, req):
+        """Return the recorded urllib3 response and body for the request, ready for build_response.
+
+        Repeated identical requests are served in recorded order, the last
+        recording is reused once they run out. The response elapsed time is
+        set by requests to the real in-process time, use replay_latency to
+        reproduce the recorded one.
+        """
+        self._check_open()
+        key = request_key(req)
+        recorded = self._entries.get(key)
+        if not recorded:
+            raise CassetteMissError(f"No recorded response for: {key}")
+        with self._lock:
+            position = self._cursors.get(key, 0)
+            self._cursors[key] = position + 1
+        entry = recorded[min(position, len(recorded) - 1)]
+        end = entry['offset'] + entry['length']
+        if end > len(self._data):
+            raise ValueError(f"Cassette entry for {key} is outside of {self.data_path}")
+        if self.replay_latency:
+            time.sleep(entry['elapsed'])
+
+        headers = HTTPHeaderDict()
+        msg = http.client.HTTPMessage()
+        for name, value in entry['headers']:
+            headers.add(name, value)
+            msg[name] = value
+        body = bytes(self._data[entry['offset']:end])
+        # the stored body is already decoded, never let urllib3 decode it again
+        return HTTPResponse(body=io.BytesIO(body), headers=headers, status=entry['status'],
+                            reason=entry['reason'], preload_content=False, decode_content=False,
+                            original_response=_RecordedHttpResponse(msg), msg=msg,
+                            request_method=req.method, request_url=req.url), body
+
+    def close(self):
+        """Swap in the recorded files when recording and release the body file"""
+        if self._data_file is None:
+            return
+        if self.recording:
+            self._data_file.close()
+            with open(self._index_tmp_path, 'w', encoding='utf-8') as handle:
+                json.dump({'version': CASSETTE_VERSION, 'data_size': self._offset,
+                           'entries': self._entries}, handle)
+            # an old index left next to the new bodies by a crash here fails the data_size check
+            os.replace(self._data_tmp_path, self.data_path)
+            os.replace(self._index_tmp_path, self.index_path)
+        else:
+            if isinstance(self._data, mmap.mmap):
+                self._data.close()
+            self._data_file.close()
+        self._data_file = None
+
+    def discard(self):
+        """Drop an unfinished recording, leaving any previous cassette on disk untouched"""
+        if self.recording and not self.closed:
+            self._data_file.close()
+            self._data_file = None
+            os.remove(self._data_tmp_path)
+        else:
+            self.close()
+
+
+class CassetteAdapter(requests.adapters.HTTPAdapter):
+    """Transport adapter that records through to the network or replays from a cassette"""
+
+    def __init__(self, cassette, **kwargs):
+        self.cassette = cassette
+        super(CassetteAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        buffer_body(request)
+        if not self.cassette.recording:
+            raw, body = self.cassette.play(request)
+            resp = self.build_response(request, raw)
+            resp._content = body
+            resp._content_consumed = True
+            return resp
+        start = time.perf_counter()
+        resp = super(CassetteAdapter, self).send(request, **kwargs)
+        _ = resp.content  # read the body so the recorded latency covers the full transfer
+        self.cassette.record(request, resp, time.perf_counter() - start)
+        return resp
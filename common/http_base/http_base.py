@@ -8,6 +8,8 @@ import urllib3  # pylint: disable=E0401
 from random import choice
 from string import ascii_uppercase
 
+from common.http_base.cassette import CassetteAdapter
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)  # pylint: disable=E1101
 
 line_separator = '\n' + 80 * '_'
@@ -50,6 +52,8 @@ class HttpClientBase(object):
     :type base_url: str
     :param http_timeout: the amount of time to timeout
     :type http_timeout: int
+    :param cassette: record responses into, or replay them from, this cassette instead of only the network
+    :type cassette: common.http_base.cassette.Cassette
     """
 
     def __init__(self,
@@ -59,7 +63,8 @@ class HttpClientBase(object):
                  http_timeout=(6.05, 30),
                  content_type='application/json',
                  max_retries=0,
-                 extra_headers=None):
+                 extra_headers=None,
+                 cassette=None):
         self.base_url = base_url
         # http headers
         self.headers = {}
@@ -71,10 +76,15 @@ class HttpClientBase(object):
             self.headers.update(extra_headers)
         self.http_timeout = http_timeout
         self.logger = logger
+        self.cassette = cassette
 
         self.session = requests.Session()
-        http_adapter = requests.adapters.HTTPAdapter(max_retries=max_retries)
-        https_adapter = requests.adapters.HTTPAdapter(max_retries=max_retries)
+        if cassette is not None:
+            http_adapter = CassetteAdapter(cassette, max_retries=max_retries)
+            https_adapter = CassetteAdapter(cassette, max_retries=max_retries)
+        else:
+            http_adapter = requests.adapters.HTTPAdapter(max_retries=max_retries)
+            https_adapter = requests.adapters.HTTPAdapter(max_retries=max_retries)
         self.session.mount('http://', http_adapter)
         self.session.mount('https://', https_adapter)
 
@@ -243,3 +253,5 @@ class HttpClientBase(object):
 
     def close(self):
         self.session.close()
+        if self.cassette is not None:
+            self.cassette.close()
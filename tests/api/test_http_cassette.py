@@ -0,0 +1,262 @@
+import io
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import allure
+import pytest
+
+from common.clients.api_client import ApiClient
+from common.clients.client_factory import ClientFactory
+from common.http_base.cassette import Cassette, CassetteMissError, RECORD, REPLAY
+
+SLOW_RESPONSE_S = 0.2
+
+
+class _SlowApiHandler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        _SlowApiHandler.hits += 1
+        if self.path.startswith("/v1/telemetry"):
+            time.sleep(SLOW_RESPONSE_S)
+            self._send_json(200, {"altitude": 50.0, "hit": _SlowApiHandler.hits})
+        elif self.path.startswith("/v1/login"):
+            self._send_json(200, {"status": "ok"},
+                            cookies=["session=abc123; Path=/", "crew=pilot; Path=/"])
+        else:
+            self._send_json(404, {"error": "not_found"})
+
+    def do_POST(self):
+        _SlowApiHandler.hits += 1
+        body_len = int(self.headers.get("Content-Length", "0"))
+        body = self.rfile.read(body_len).decode("utf-8") if body_len else "{}"
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            payload = {"raw": body}
+        self._send_json(201, {"received": payload, "hit": _SlowApiHandler.hits})
+
+    def _send_json(self, status, payload, cookies=()):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for cookie in cookies:
+            self.send_header("Set-Cookie", cookie)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        return
+
+
+@pytest.fixture(scope="module")
+def api_server():
+    server = HTTPServer(("127.0.0.1", 0), _SlowApiHandler)
+    host, port = server.server_address
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join(timeout=1)
+
+
+@pytest.fixture
+def recorded_cassette(api_server, tmp_path):
+    logger = logging.getLogger("api.cassette.record")
+    path = str(tmp_path / "cassettes" / "telemetry")
+    client = ApiClient(base_url=api_server, logger=logger, cassette=Cassette(path, mode=RECORD))
+    client.get("v1/telemetry", params={"b": "2", "a": "1"})
+    client.post("v1/command", data={"command": "arming", "value": True})
+    client.get("v1/missing")
+    client.close()
+    return path
+
+
+@allure.feature("API")
+@allure.story("Cassette replay")
+@pytest.mark.api
+def test_replay_serves_recorded_responses_without_network(api_server, recorded_cassette):
+    logger = logging.getLogger("api.cassette.replay")
+    hits = _SlowApiHandler.hits
+    client = ApiClient(base_url=api_server, logger=logger,
+                       cassette=Cassette(recorded_cassette, mode=REPLAY))
+
+    telemetry = client.get("v1/telemetry", params={"a": "1", "b": "2"})
+    command = client.post("v1/command", data={"command": "arming", "value": True})
+    missing = client.get("v1/missing")
+    client.close()
+
+    assert telemetry.status_code == 200
+    assert telemetry.headers["Content-Type"] == "application/json"
+    assert telemetry.json()["altitude"] == 50.0
+    assert telemetry.elapsed.total_seconds() < SLOW_RESPONSE_S
+    assert command.status_code == 201
+    assert command.json()["received"] == {"command": "arming", "value": True}
+    assert missing.status_code == 404
+    assert _SlowApiHandler.hits == hits
+
+
+@allure.feature("API")
+@allure.story("Cassette replay")
+@pytest.mark.api
+def test_replay_reproduces_recorded_latency(api_server, recorded_cassette):
+    logger = logging.getLogger("api.cassette.latency")
+    client = ApiClient(base_url=api_server, logger=logger,
+                       cassette=Cassette(recorded_cassette, mode=REPLAY, replay_latency=True))
+
+    response = client.get("v1/telemetry", params={"a": "1", "b": "2"})
+    client.close()
+
+    assert response.elapsed.total_seconds() >= SLOW_RESPONSE_S
+
+
+@allure.feature("API")
+@allure.story("Cassette replay")
+@pytest.mark.api
+def test_replay_miss_raises(api_server, recorded_cassette):
+    logger = logging.getLogger("api.cassette.miss")
+    client = ApiClient(base_url=api_server, logger=logger,
+                       cassette=Cassette(recorded_cassette, mode=REPLAY))
+
+    with pytest.raises(CassetteMissError):
+        client.post("v1/command", data={"command": "disarm"})
+    client.close()
+
+
+@allure.feature("API")
+@allure.story("Cassette replay")
+@pytest.mark.api
+def test_client_factory_passes_cassette(api_server, recorded_cassette):
+    logger = logging.getLogger("api.cassette.factory")
+    client = ClientFactory().create("ApiClient", api_server, logger,
+                                    cassette=Cassette(recorded_cassette, mode=REPLAY))
+
+    response = client.get("v1/missing")
+    client.close()
+
+    assert response.status_code == 404
+
+
+@allure.feature("API")
+@allure.story("Cassette replay")
+@pytest.mark.api
+def test_replay_serves_repeated_requests_in_recorded_order(api_server, tmp_path):
+    logger = logging.getLogger("api.cassette.order")
+    path = str(tmp_path / "order")
+    client = ApiClient(base_url=api_server, logger=logger, cassette=Cassette(path, mode=RECORD))
+    recorded = [client.get("v1/telemetry").json()["hit"] for _ in range(2)]
+    client.close()
+
+    client = ApiClient(base_url=api_server, logger=logger, cassette=Cassette(path, mode=REPLAY))
+    replayed = [client.get("v1/telemetry").json()["hit"] for _ in range(3)]
+    client.close()
+
+    assert replayed == recorded + recorded[-1:]
+
+
+@allure.feature("API")
+@allure.story("Cassette replay")
+@pytest.mark.api
+def test_aborted_record_keeps_previous_cassette(api_server, recorded_cassette):
+    logger = logging.getLogger("api.cassette.aborted")
+    with pytest.raises(RuntimeError):
+        with Cassette(recorded_cassette, mode=RECORD) as cassette:
+            aborted = ApiClient(base_url=api_server, logger=logger, cassette=cassette)
+            aborted.post("v1/command", data={"command": "zzzzzzzzzzzzzzzzzzzzzzzzzzzz"})
+            raise RuntimeError("bench run aborted")
+    aborted.close()
+
+    assert not os.path.exists(recorded_cassette + ".dat.tmp")
+
+    client = ApiClient(base_url=api_server, logger=logger,
+                       cassette=Cassette(recorded_cassette, mode=REPLAY))
+    response = client.post("v1/command", data={"command": "arming", "value": True})
+    client.close()
+
+    assert response.json()["received"] == {"command": "arming", "value": True}
+
+
+@allure.feature("API")
+@allure.story("Cassette replay")
+@pytest.mark.api
+def test_shared_cassette_raises_once_closed(api_server, recorded_cassette):
+    logger = logging.getLogger("api.cassette.shared")
+    factory = ClientFactory()
+    cassette = Cassette(recorded_cassette, mode=REPLAY)
+    first = factory.create("ApiClient", api_server, logger, cassette=cassette)
+    second = factory.create("ApiClient", api_server, logger, cassette=cassette)
+    first.close()
+
+    with pytest.raises(ValueError, match="is closed"):
+        second.get("v1/missing")
+    second.close()
+
+
+@allure.feature("API")
+@allure.story("Cassette replay")
+@pytest.mark.api
+def test_replay_sets_recorded_cookies(api_server, tmp_path):
+    logger = logging.getLogger("api.cassette.cookies")
+    path = str(tmp_path / "login")
+    client = ApiClient(base_url=api_server, logger=logger, cassette=Cassette(path, mode=RECORD))
+    live = client.get("v1/login")
+    live_cookies = client.session.cookies.get_dict()
+    client.close()
+
+    client = ApiClient(base_url=api_server, logger=logger, cassette=Cassette(path, mode=REPLAY))
+    replayed = client.get("v1/login")
+    replayed_cookies = client.session.cookies.get_dict()
+    client.close()
+
+    assert live_cookies == {"session": "abc123", "crew": "pilot"}
+    assert replayed_cookies == live_cookies
+    assert replayed.cookies.get_dict() == live.cookies.get_dict()
+    assert replayed.encoding == live.encoding
+    assert replayed.url == live.url
+
+
+@allure.feature("API")
+@allure.story("Cassette replay")
+@pytest.mark.api
+def test_replay_rejects_truncated_body_file(api_server, recorded_cassette):
+    logger = logging.getLogger("api.cassette.truncated")
+    with open(recorded_cassette + ".dat", "r+b") as handle:
+        handle.truncate(os.path.getsize(recorded_cassette + ".dat") // 2)
+
+    with pytest.raises(ValueError):
+        Cassette(recorded_cassette, mode=REPLAY)
+
+
+@allure.feature("API")
+@allure.story("Cassette replay")
+@pytest.mark.api
+def test_replay_streamed_and_multipart_bodies(api_server, tmp_path):
+    logger = logging.getLogger("api.cassette.uploads")
+    path = str(tmp_path / "uploads")
+
+    def send(client):
+        streamed = client.post("v1/upload", data=io.BytesIO(b"firmware-image"), payload_binary=True)
+        multipart = client.post("v1/upload", files={"log": ("flight.log", b"pitch=1.5")})
+        return streamed.json(), multipart.json()
+
+    client = ApiClient(base_url=api_server, logger=logger, cassette=Cassette(path, mode=RECORD))
+    recorded = send(client)
+    client.close()
+
+    hits = _SlowApiHandler.hits
+    client = ApiClient(base_url=api_server, logger=logger, cassette=Cassette(path, mode=REPLAY))
+    replayed = send(client)
+    client.close()
+
+    assert recorded[0]["received"] == {"raw": "firmware-image"}
+    assert "pitch=1.5" in recorded[1]["received"]["raw"]
+    assert replayed == recorded
+    assert _SlowApiHandler.hits == hits